@@ -1,7 +1,9 @@
 # lab.py
 
 
+from collections import deque
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import io
 import pandas as pd
 import numpy as np
@@ -107,10 +109,76 @@ def add_root(A):
     return A + np.sqrt(indices)
 
 def where_square(A):
+    A = np.asarray(A)
+
+    # integers go through the exact path (float64 can't tell squares apart above 2**52)
+    if np.issubdtype(A.dtype, np.integer):
+        return _where_square_int(A)
+
     roots = np.sqrt(A)
     return roots == roots.astype(int)
 
 
+# a perfect square mod m can only land on one of the quadratic residues mod m,
+# so these lookup tables throw out most non-squares before any sqrt is taken
+def _qr_table(m):
+    table = np.zeros(m, dtype=bool)
+    table[(np.arange(m) ** 2) % m] = True
+    return table
+
+
+_QR_TABLES = {m: _qr_table(m) for m in (64, 63, 65, 11)}
+
+
+def _where_square_int(A):
+    flat = A.ravel()
+    out = np.zeros(flat.shape, dtype=bool)
+
+    # negatives are never squares; everything else fits in uint64
+    x = flat.astype(np.uint64)
+    candidate = flat >= 0
+    for m, table in _QR_TABLES.items():
+        candidate &= table[x % np.uint64(m)]
+
+    idx = np.flatnonzero(candidate)
+    if idx.size == 0:
+        return out.reshape(A.shape)
+    x = x[idx]
+
+    # float estimate is within 1 of the true root; cap it so r * r can't overflow
+    r = np.sqrt(x.astype(np.float64)).astype(np.uint64)
+    r = np.minimum(r, np.uint64(2**32 - 1))
+
+    # one integer correction step in each direction, then the exact comparison
+    r -= (r * r > x).astype(np.uint64)
+    r1 = r + np.uint64(1)
+    r += ((r < np.uint64(2**32 - 1)) & (r1 * r1 <= x)).astype(np.uint64)
+
+    out[idx] = r * r == x
+    return out.reshape(A.shape)
+
+
+def where_square_npy(fp, out_fp=None, chunk_size=10_000_000):
+    # memory-map the input so only one chunk is ever resident
+    A = np.load(fp, mmap_mode="r")
+
+    # write into an on-disk .npy when asked, otherwise a plain bool array
+    if out_fp is not None:
+        out = np.lib.format.open_memmap(out_fp, mode="w+", dtype=bool, shape=A.shape)
+    else:
+        out = np.empty(A.shape, dtype=bool)
+
+    flat_in = A.reshape(-1)
+    flat_out = out.reshape(-1)
+    for start in range(0, flat_in.size, chunk_size):
+        stop = min(start + chunk_size, flat_in.size)
+        flat_out[start:stop] = where_square(np.asarray(flat_in[start:stop]))
+
+    if out_fp is not None:
+        out.flush()
+    return out
+
+
 # ---------------------------------------------------------------------
 # QUESTION 6
 # ---------------------------------------------------------------------
@@ -156,13 +224,56 @@ def filter_cutoff_np(matrix, cutoff):
     return matrix[:, mask]
 
 
+def filter_cutoff_npy(fp, cutoff, out_fp=None, chunk_bytes=256 * 2**20, n_workers=4):
+    # memory-map the matrix; each worker only ever holds one block of rows
+    matrix = np.load(fp, mmap_mode="r")
+    num_rows, num_cols = matrix.shape
+    row_bytes = max(1, num_cols * matrix.dtype.itemsize)
+    chunk_rows = max(1, chunk_bytes // row_bytes)
+    starts = range(0, num_rows, chunk_rows)
+
+    def col_sums(start):
+        block = matrix[start:start + chunk_rows]
+        return block.sum(axis=0, dtype=np.float64)
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        # pass 1: column means from float64 partial sums (added up in row order)
+        sums = np.zeros(num_cols, dtype=np.float64)
+        for partial in pool.map(col_sums, starts):
+            sums += partial
+        keep = np.flatnonzero(sums / num_rows > cutoff)
+
+        # pass 2: copy only the surviving columns, one row block per task
+        shape = (num_rows, keep.size)
+        if out_fp is not None:
+            out = np.lib.format.open_memmap(out_fp, mode="w+", dtype=matrix.dtype, shape=shape)
+        else:
+            out = np.empty(shape, dtype=matrix.dtype)
+
+        def copy_cols(start):
+            stop = min(start + chunk_rows, num_rows)
+            out[start:stop] = matrix[start:stop][:, keep]
+
+        list(pool.map(copy_cols, starts))
+
+    if out_fp is not None:
+        out.flush()
+    return out
+
+
 # ---------------------------------------------------------------------
 # QUESTION 7
 # ---------------------------------------------------------------------
 
 
+def load_prices(fp, delimiter=","):
+    # one C-level parse straight into a (days × tickers) float array;
+    # a single-column file like stocks.csv comes back as (days × 1)
+    return np.loadtxt(fp, delimiter=delimiter, dtype=np.float64, ndmin=2)
+
+
 def growth_rates(A):
-    # differences between consecutive days
+    # differences between consecutive days (per column when A is days × tickers)
     diffs = A[1:] - A[:-1]
     rates = diffs / A[:-1]
     # round to 2 decimal places
@@ -172,15 +283,52 @@ def growth_rates(A):
 def with_leftover(A):
      # leftover from each day's $20
     daily_leftover = 20 % A              # vectorized modulo
-    cum_leftover = np.cumsum(daily_leftover)
+    cum_leftover = np.cumsum(daily_leftover, axis=0)
 
     # days where leftover is enough to buy 1 share at that day's price
-    good_days = np.where(cum_leftover >= A)[0]
+    good_days = cum_leftover >= A
 
-    if good_days.size == 0:
-        return -1
+    # argmax finds the first True per ticker; tickers that never qualify get -1
+    # (as do all tickers when there are no days at all)
+    if len(A) == 0:
+        first = np.full(A.shape[1:], -1)
     else:
-        return int(good_days[0])
+        first = np.where(good_days.any(axis=0), good_days.argmax(axis=0), -1)
+
+    if A.ndim == 1:
+        return int(first)
+    return first
+
+
+class PriceHistory:
+    # keeps just enough running state (last prices, cumulative leftover) to
+    # extend growth_rates / with_leftover as new daily rows are appended
+
+    def __init__(self, num_tickers):
+        self.num_days = 0
+        self.last_prices = None
+        self.cum_leftover = np.zeros(num_tickers)
+        self.first_leftover_day = np.full(num_tickers, -1)
+
+    def append(self, rows):
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+
+        # growth rates for the new rows, bridging from the previous last day
+        if self.last_prices is None:
+            rates = growth_rates(rows)
+        else:
+            rates = growth_rates(np.vstack([self.last_prices, rows]))
+
+        # continue the cumulative leftover and only fill tickers still at -1
+        cum = self.cum_leftover + np.cumsum(20 % rows, axis=0)
+        good_days = cum >= rows
+        new_hits = (self.first_leftover_day == -1) & good_days.any(axis=0)
+        self.first_leftover_day[new_hits] = self.num_days + good_days.argmax(axis=0)[new_hits]
+
+        self.cum_leftover = cum[-1]
+        self.last_prices = rows[-1]
+        self.num_days += len(rows)
+        return rates
 
 
 # ---------------------------------------------------------------------
@@ -189,45 +337,142 @@ def with_leftover(A):
 
 
 def salary_stats(Salary):
-     # 1
-    num_players = len(Salary)
-    
-    # 2
-    num_teams = Salary['Team'].nunique()
-    
-    # 3
-    total_salary = Salary['Salary'].sum()
-    
-    # 4
-    highest_salary_name = Salary.loc[Salary['Salary'].idxmax(), 'Player']
-    
-    # 5
-    avg_los = round(Salary[Salary['Team'].str.contains("Los Angeles Lakers")]['Salary'].mean(), 2)
-    
-    # 6
-    fifth_row = Salary.sort_values('Salary').iloc[4]
-    fifth_lowest = f"{fifth_row['Player']}, {fifth_row['Team']}"
-    
-    # 7 — detect duplicate last names ignoring suffixes
-    cleaned = Salary['Player'].str.replace(r"\b(Jr\.?|II|III|IV|V)\b", "", regex=True).str.strip()
-    last_names = cleaned.str.split().str[-1]
-    duplicates = last_names.duplicated().any()
-    
-    # 8 — sum of salaries on team of highest-paid player
-    highest_team = Salary.loc[Salary['Salary'].idxmax(), 'Team']
-    total_highest = Salary[Salary['Team'] == highest_team]['Salary'].sum()
-    
-    # return Series in correct order
-    return pd.Series({
-        'num_players': num_players,
-        'num_teams': num_teams,
-        'total_salary': total_salary,
-        'highest_salary': highest_salary_name,
-        'avg_los': avg_los,
-        'fifth_lowest': fifth_lowest,
-        'duplicates': duplicates,
-        'total_highest': total_highest
-    })
+    # Salary is either one DataFrame or an iterable of chunks
+    # (e.g. pd.read_csv(fp, chunksize=...)), summarized in one streaming read
+    chunks = [Salary] if isinstance(Salary, pd.DataFrame) else Salary
+
+    acc = _SalaryAccumulator()
+    for chunk in chunks:
+        acc.update(chunk)
+    return acc.result()
+
+
+_NAME_SUFFIXES = r"\b(Jr\.?|II|III|IV|V)\b"
+
+
+class _SalaryAccumulator:
+    # running per-team sums/counts (indexed by a global team code), the
+    # current max row, the 5 lowest rows seen so far and a set of surnames
+
+    def __init__(self, k=5):
+        self.k = k
+        self.num_players = 0
+        self.total_salary = 0
+        self.team_ids = {}
+        self.team_names = []
+        self.team_sums = np.zeros(0)
+        self.team_counts = np.zeros(0, dtype=np.int64)
+        self.max_salary = None
+        self.max_player = None
+        self.max_team = None
+        self.salary_dtype = None
+        self.lowest = None
+        self.surnames = set()
+        self.duplicates = False
+
+    def update(self, chunk):
+        salary = chunk["Salary"].to_numpy()
+        n = len(salary)
+        if n == 0:
+            return
+
+        # 1, 3 — missing salaries are skipped, as Series.sum/mean/idxmax do
+        self.salary_dtype = salary.dtype
+        offset = self.num_players
+        self.num_players += n
+        self.total_salary = self.total_salary + np.nansum(salary)
+        valid = ~pd.isna(salary)
+
+        # 2, 5, 8 — one factorization of Team, mapped onto global team codes
+        codes, uniques = pd.factorize(chunk["Team"])
+        for name in uniques:
+            if name not in self.team_ids:
+                self.team_ids[name] = len(self.team_names)
+                self.team_names.append(name)
+        to_global = np.array([self.team_ids[name] for name in uniques], dtype=np.int64)
+        # rows with a missing team keep code -1 and stay out of the team sums
+        global_codes = np.full(n, -1, dtype=np.int64)
+        global_codes[codes >= 0] = to_global[codes[codes >= 0]]
+        in_team = (global_codes >= 0) & valid
+
+        num_teams = len(self.team_names)
+        self.team_sums = np.pad(self.team_sums, (0, num_teams - len(self.team_sums)))
+        self.team_counts = np.pad(self.team_counts, (0, num_teams - len(self.team_counts)))
+        self.team_sums += np.bincount(global_codes[in_team], weights=salary[in_team], minlength=num_teams)
+        self.team_counts += np.bincount(global_codes[in_team], minlength=num_teams)
+
+        rows = np.flatnonzero(valid)
+        if len(rows) == 0:
+            self._update_surnames(chunk)
+            return
+        valid_salary = salary[rows]
+
+        # 4, 8 — a single argmax gives both the player and their team
+        i = rows[np.argmax(valid_salary)]
+        if self.max_salary is None or salary[i] > self.max_salary:
+            self.max_salary = salary[i]
+            self.max_player = chunk["Player"].iloc[i]
+            self.max_team = global_codes[i]
+
+        # 6 — argpartition for this chunk's k smallest (ties broken by row order),
+        # then merge with the k smallest from earlier chunks
+        k = min(self.k, len(rows))
+        kth = valid_salary[np.argpartition(valid_salary, k - 1)[k - 1]]
+        below = rows[valid_salary < kth]
+        at = rows[valid_salary == kth][: k - len(below)]
+        idx = np.concatenate([below, at])
+        candidates = pd.DataFrame({
+            "Salary": salary[idx],
+            "row": idx + offset,
+            "Player": chunk["Player"].to_numpy()[idx],
+            "Team": chunk["Team"].to_numpy()[idx],
+        })
+        if self.lowest is not None:
+            candidates = pd.concat([self.lowest, candidates], ignore_index=True)
+        self.lowest = (
+            candidates
+              .sort_values(["Salary", "row"], kind="stable")
+              .iloc[: self.k]
+        )
+
+        self._update_surnames(chunk)
+
+    def _update_surnames(self, chunk):
+        # 7 — hashed pass over surnames (suffixes ignored); stop once a repeat is seen
+        if not self.duplicates:
+            cleaned = chunk["Player"].str.replace(_NAME_SUFFIXES, "", regex=True).str.strip()
+            for last in cleaned.str.split().str[-1]:
+                if last in self.surnames:
+                    self.duplicates = True
+                    break
+                self.surnames.add(last)
+
+    def result(self):
+        if self.num_players == 0:
+            raise ValueError("salary_stats needs at least one row of salaries")
+        team_names = pd.Series(self.team_names, dtype=object)
+        lakers = team_names.str.contains("Los Angeles Lakers").to_numpy(dtype=bool)
+        avg_los = round(self.team_sums[lakers].sum() / self.team_counts[lakers].sum(), 2)
+
+        # salaries are usually ints, so hand back the team total in the same dtype
+        # (nothing if every salary or the top earner's team is missing)
+        top_team_sum = self.team_sums[self.max_team] if self.max_team is not None and self.max_team >= 0 else 0
+        total_highest = self.salary_dtype.type(top_team_sum)
+
+        fifth_row = self.lowest.iloc[self.k - 1]
+        fifth_lowest = f"{fifth_row['Player']}, {fifth_row['Team']}"
+
+        # return Series in correct order
+        return pd.Series({
+            'num_players': self.num_players,
+            'num_teams': len(self.team_names),
+            'total_salary': self.total_salary,
+            'highest_salary': self.max_player,
+            'avg_los': avg_los,
+            'fifth_lowest': fifth_lowest,
+            'duplicates': np.bool_(self.duplicates),
+            'total_highest': total_highest
+        })
 
 
 # ---------------------------------------------------------------------
@@ -235,54 +480,103 @@ def salary_stats(Salary):
 # ---------------------------------------------------------------------
 
 
-def parse_malformed(fp):
-    rows = []
-
-    with open(fp, "r") as fh:
-        # Skip header line
-        header = fh.readline()
-
-        for line in fh:
-            line = line.strip()
-            if not line:
-                continue  # skip any empty lines
-
-            # Remove quotes to simplify parsing
-            line = line.replace('"', '')
-
-            # Split and strip whitespace
-            raw_parts = [p.strip() for p in line.split(',')]
-
-            # Remove empty tokens caused by extra commas
-            parts = [p for p in raw_parts if p != '']
-
-            # From the RIGHT:
-            # last two pieces are lat, lon → geo
-            lon = parts[-1]
-            lat = parts[-2]
-            geo = f"{lat},{lon}"
+def parse_malformed(fp, block_bytes=64 * 2**20, n_workers=1, quarantine=None):
+    chunks = list(parse_malformed_chunks(fp, block_bytes, n_workers, quarantine))
+    if not chunks:
+        return pd.DataFrame(columns=_MALFORMED_COLS)
+    return pd.concat(chunks, ignore_index=True)
+
+
+_MALFORMED_COLS = ["first", "last", "weight", "height", "geo"]
+
+
+def _newline_blocks(fp, block_bytes):
+    # large binary reads, cut at the last newline so no record straddles two blocks
+    with open(fp, "rb") as fh:
+        fh.readline()  # skip header line
+        leftover = b""
+        while True:
+            block = fh.read(block_bytes)
+            if not block:
+                break
+            block = leftover + block
+            cut = block.rfind(b"\n") + 1
+            if cut == 0:
+                leftover = block
+                continue
+            leftover = block[cut:]
+            yield block[:cut]
+        if leftover:
+            yield leftover
+
+
+def _parse_malformed_block(block):
+    lines = pd.Series(block.decode("utf-8").split("\n")).str.strip()
+    lines = lines[lines != ""]
+
+    # whole-block normalization: drop quotes, trim around commas, collapse
+    # repeated commas and peel any commas left hanging at either end
+    norm = (
+        lines.str.replace('"', "", regex=False)
+             .str.replace(r"\s*,\s*", ",", regex=True)
+             .str.replace(r",{2,}", ",", regex=True)
+             .str.strip(", ")
+    )
+
+    # from the RIGHT: name info, weight, height, lat, lon
+    parts = norm.str.rsplit(",", n=4, expand=True).reindex(columns=range(5))
+    names = parts[0].str.split(",", n=1, expand=True).reindex(columns=range(2))
+
+    df = pd.DataFrame({
+        "first": names[0],
+        # join anything after first into last (in case of extra commas)
+        "last": names[1].str.replace(",", " ", regex=False).fillna(""),
+        "weight": pd.to_numeric(parts[1], errors="coerce").astype(float),
+        "height": pd.to_numeric(parts[2], errors="coerce").astype(float),
+        "geo": parts[3] + "," + parts[4],
+    })
 
-            # Next two to the left are height and weight
-            height_raw = parts[-3]
-            weight_raw = parts[-4]
+    # rows that still don't fit the schema are handed back separately
+    bad = df["weight"].isna() | df["height"].isna() | df["geo"].isna()
+    return df[~bad].reset_index(drop=True), lines[bad].tolist()
 
-            height = float(height_raw)
-            weight = float(weight_raw)
 
-            # Everything before those 4 tokens is name info
-            name_parts = parts[:-4]
+def _parse_blocks_bounded(pool, blocks, window):
+    # like pool.map, but with at most `window` blocks read and in flight at
+    # once, so memory stays at a few blocks whatever the file size
+    pending = deque()
+    for block in blocks:
+        pending.append(pool.submit(_parse_malformed_block, block))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
 
-            # Expect at least first and last name
-            if len(name_parts) >= 2:
-                first = name_parts[0]
-                # join anything after first into last (in case of extra commas)
-                last = " ".join(name_parts[1:]).strip()
-            else:
-                # fallback; shouldn't really happen with this dataset
-                first = name_parts[0] if name_parts else ""
-                last = ""
 
-            rows.append((first, last, weight, height, geo))
+def parse_malformed_chunks(fp, block_bytes=64 * 2**20, n_workers=1, quarantine=None):
+    # yields typed DataFrame chunks. Unparseable raw lines go to `quarantine`
+    # (a path or an open text file) when one is given; without one the first
+    # such line raises a ValueError
+    blocks = _newline_blocks(fp, block_bytes)
 
-    df = pd.DataFrame(rows, columns=["first", "last", "weight", "height", "geo"])
-    return df
\ No newline at end of file
+    if n_workers > 1:
+        pool = ProcessPoolExecutor(max_workers=n_workers)
+        results = _parse_blocks_bounded(pool, blocks, 2 * n_workers)
+    else:
+        pool = None
+        results = map(_parse_malformed_block, blocks)
+
+    qfh = open(quarantine, "w") if isinstance(quarantine, (str, Path)) else quarantine
+    try:
+        for df, bad_lines in results:
+            if bad_lines:
+                if qfh is None:
+                    raise ValueError(f"could not parse line {bad_lines[0]!r}; pass quarantine= to collect bad lines")
+                qfh.writelines(line + "\n" for line in bad_lines)
+            if len(df):
+                yield df
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if qfh is not None and qfh is not quarantine:
+            qfh.close()
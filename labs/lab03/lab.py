@@ -3,7 +3,15 @@
 
 import os
 import io
+import re
+import calendar
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from functools import cached_property
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 
@@ -13,17 +21,52 @@ import numpy as np
 # ---------------------------------------------------------------------
 
 
-def read_linkedin_survey(dirname):
-    
-    target_cols = [
-        "first name",
-        "last name",
-        "current company",
-        "job title",
-        "email",
-        "university"
-    ]
+LINKEDIN_COLS = [
+    "first name",
+    "last name",
+    "current company",
+    "job title",
+    "email",
+    "university"
+]
+
+# most recently parsed survey files: path -> ((size, mtime), frame), so
+# unchanged files are skipped. A rewritten file replaces its old entry; the
+# reader threads share it under _SURVEY_LOCK
+_SURVEY_CACHE = OrderedDict()
+_SURVEY_CACHE_MAX = 256
+_SURVEY_LOCK = threading.Lock()
+
+
+def _normalize_col(name):
+    return name.lower().replace("_", " ").strip()
+
+
+def _read_survey_file(fp):
+    stat = fp.stat()
+    path, version = str(fp.resolve()), (stat.st_size, stat.st_mtime_ns)
+    with _SURVEY_LOCK:
+        cached = _SURVEY_CACHE.get(path)
+        if cached is not None and cached[0] == version:
+            _SURVEY_CACHE.move_to_end(path)
+            return cached[1]
 
+    # look at the header alone, then only parse the columns we want
+    header = pd.read_csv(fp, nrows=0).columns
+    rename = {c: _normalize_col(c) for c in header if _normalize_col(c) in LINKEDIN_COLS}
+
+    df = pd.read_csv(fp, usecols=list(rename), dtype=object)
+    df = df.rename(columns=rename).reindex(columns=LINKEDIN_COLS)
+
+    with _SURVEY_LOCK:
+        _SURVEY_CACHE[path] = (version, df)
+        _SURVEY_CACHE.move_to_end(path)
+        while len(_SURVEY_CACHE) > _SURVEY_CACHE_MAX:
+            _SURVEY_CACHE.popitem(last=False)
+    return df
+
+
+def read_linkedin_survey(dirname, n_workers=8):
     d = Path(dirname)
 
     # If the directory doesn't exist, raise FileNotFoundError
@@ -36,32 +79,28 @@ def read_linkedin_survey(dirname):
     if len(files) == 0:
         raise FileNotFoundError(f"No survey files found in {dirname}")
 
-    dfs = []
-    for fp in files:
-        df = pd.read_csv(fp)
-
-        df.columns = (
-            df.columns
-              .str.lower()
-              .str.replace("_", " ", regex=False)
-              .str.strip()
-        )
-
-        df = df.reindex(columns=target_cols)
-        dfs.append(df)
+    # files are parsed concurrently, then concatenated once in sorted order
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        dfs = list(pool.map(_read_survey_file, files))
 
     return pd.concat(dfs, ignore_index=True)
 
 
 def com_stats(df):
-    titles = df["job title"]
-    unis = df["university"]
+    # every predicate on a column is evaluated once per distinct string
+    uni_codes, _, uni_hits = TextMatcher().contains("ohio", "Ohio").evaluate_unique(df["university"])
+    title_codes, title_uniques, title_hits = (
+        TextMatcher()
+        .contains("programmer", "Programmer")
+        .endswith("engineer", "Engineer")
+        .contains("manager", "manager", case=False)
+        .evaluate_unique(df["job title"])
+    )
+    ohio_mask = _broadcast(uni_hits["ohio"], uni_codes)
+    programmer_mask = _broadcast(title_hits["programmer"], title_codes)
 
     # 1) Proportion: among people whose university contains 'Ohio',
     #    proportion whose job title contains 'Programmer'
-    ohio_mask = unis.fillna("").str.contains("Ohio", na=False)
-    programmer_mask = titles.fillna("").str.contains("Programmer", na=False)
-
     ohio_total = int(ohio_mask.sum())
     if ohio_total == 0:
         prop_ohio_programmer = 0.0
@@ -69,20 +108,14 @@ def com_stats(df):
         prop_ohio_programmer = (ohio_mask & programmer_mask).sum() / ohio_total
 
     # 2) UNIQUE job titles that end with exact string 'Engineer'
-    num_unique_engineer_titles = (
-        titles
-        .dropna()
-        .loc[titles.str.endswith("Engineer", na=False)]
-        .nunique()
-    )
+    num_unique_engineer_titles = title_hits["engineer"].sum()
 
     # 3) Job title with the longest name (no ties)
     #    Ignore missing job titles
-    non_null_titles = titles.dropna()
-    longest_title = non_null_titles.loc[non_null_titles.str.len().idxmax()]
+    longest_title = title_uniques[np.argmax([len(t) for t in title_uniques])]
 
     # 4) Number of people with 'manager' in job title, any case
-    num_people_manager = titles.fillna("").str.contains("manager", case=False, na=False).sum()
+    num_people_manager = _broadcast(title_hits["manager"], title_codes).sum()
 
     return [
         prop_ohio_programmer,
@@ -92,13 +125,129 @@ def com_stats(df):
     ]
 
 
+def _broadcast(unique_mask, codes):
+    # per-distinct-value booleans back onto the rows; missing values are False
+    unique_mask = np.append(np.asarray(unique_mask, dtype=bool), False)
+    return unique_mask[codes]
+
+
+class AhoCorasick:
+    # one automaton for any number of literal patterns; a single left-to-right
+    # walk over a string reports every (pattern id, end position) occurrence
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        self.lengths = [len(p) for p in patterns]
+
+        for pid, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                if ch not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.out[state].append(pid)
+
+        # breadth-first failure links; outputs inherit from the failure state
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter_matches(self, text):
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for pid in self.out[state]:
+                yield pid, i + 1
+
+
+class TextMatcher:
+    # literal predicates (contains/startswith/endswith, optionally
+    # case-insensitive) are compiled into one Aho-Corasick automaton per case
+    # mode; regex predicates are compiled once. Everything runs on the
+    # column's distinct values, not its rows.
+
+    def __init__(self):
+        self.names = []
+        self.literals = {True: [], False: []}   # case -> [(name, kind, pattern)]
+        self.regexes = []
+
+    def _literal(self, name, kind, pattern, case):
+        self.names.append(name)
+        self.literals[case].append((name, kind, pattern if case else pattern.lower()))
+        return self
+
+    def contains(self, name, pattern, case=True):
+        return self._literal(name, "contains", pattern, case)
+
+    def startswith(self, name, pattern, case=True):
+        return self._literal(name, "startswith", pattern, case)
+
+    def endswith(self, name, pattern, case=True):
+        return self._literal(name, "endswith", pattern, case)
+
+    def regex(self, name, pattern, flags=0):
+        self.names.append(name)
+        self.regexes.append((name, re.compile(pattern, flags)))
+        return self
+
+    def _match_one(self, text, automata):
+        hits = dict.fromkeys(self.names, False)
+        for case, (preds, automaton) in automata.items():
+            if automaton is None:
+                continue
+            s = text if case else text.lower()
+            for pid, end in automaton.iter_matches(s):
+                name, kind, pattern = preds[pid]
+                if kind == "contains":
+                    hits[name] = True
+                elif kind == "startswith" and end == len(pattern):
+                    hits[name] = True
+                elif kind == "endswith" and end == len(s):
+                    hits[name] = True
+        for name, rx in self.regexes:
+            hits[name] = rx.search(text) is not None
+        return hits
+
+    def evaluate_unique(self, series):
+        # returns (codes, distinct values, per-distinct-value predicate frame)
+        codes, uniques = pd.factorize(series)
+        automata = {
+            case: (preds, AhoCorasick([p for _, _, p in preds]) if preds else None)
+            for case, preds in self.literals.items()
+        }
+        rows = [self._match_one(str(u), automata) for u in uniques]
+        hits = pd.DataFrame(rows, columns=self.names, dtype=bool)
+        return codes, uniques, hits
+
+    def evaluate(self, series):
+        codes, _, hits = self.evaluate_unique(series)
+        return pd.DataFrame(
+            {name: _broadcast(hits[name], codes) for name in self.names},
+            index=series.index
+        )
+
+
 
 # ---------------------------------------------------------------------
 # QUESTION 2
 # ---------------------------------------------------------------------
 
 
-def read_student_surveys(dirname):
+def read_student_surveys(dirname, num_ids=1000, n_workers=8):
     d = Path(dirname)
     files = sorted(d.glob("favorite*.csv"))
     if len(files) == 0:
@@ -116,7 +265,11 @@ def read_student_surveys(dirname):
     if not f1.exists():
         raise FileNotFoundError(f"Missing {f1}")
 
-    base = pd.read_csv(f1)
+    # all question files are parsed concurrently
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        frames = dict(zip(files, pool.map(pd.read_csv, files)))
+
+    base = frames[f1]
     id_col = _find_id_col(base.columns)
 
     # find name column
@@ -129,65 +282,66 @@ def read_student_surveys(dirname):
         non_id_cols = [c for c in base.columns if c != id_col]
         name_col = non_id_cols[0]
 
-    # any remaining column besides id + name is the favorite1 response (if present)
+    # any remaining column besides id + name is the favorite1 response (if present);
+    # if there are multiple, the first becomes "favorite1" (lab usually has exactly one)
     other_cols = [c for c in base.columns if c not in [id_col, name_col]]
 
-    keep_cols = [id_col, name_col] + other_cols
-    out = base[keep_cols].rename(columns={name_col: "name"}).set_index(id_col)
-    out.index.name = "id"
+    # every column is placed straight into its slot on the dense 1..num_ids range
+    columns = {"name": _place_by_id(base[id_col], base[name_col], num_ids)}
+    for i, c in enumerate(other_cols):
+        columns["favorite1" if i == 0 else c] = _place_by_id(base[id_col], base[c], num_ids)
 
-    # If favorite1 has a response column, rename it to "favorite1"
-    if len(other_cols) >= 1:
-        # if there are multiple, keep the first (lab usually has exactly one)
-        out = out.rename(columns={other_cols[0]: "favorite1"})
-
-    # --- Read the rest as question columns ---
+    # --- The rest are question columns ---
     for fp in files:
         if fp.name == "favorite1.csv":
             continue
 
-        tmp = pd.read_csv(fp)
+        tmp = frames[fp]
         tmp_id_col = _find_id_col(tmp.columns)
         non_id_cols = [c for c in tmp.columns if c != tmp_id_col]
         resp_col = non_id_cols[0]
 
         question_name = fp.stem  # "favorite2", "favorite3", ...
-        tmp = tmp[[tmp_id_col, resp_col]].rename(columns={resp_col: question_name}).set_index(tmp_id_col)
-        tmp.index.name = "id"
+        columns[question_name] = _place_by_id(tmp[tmp_id_col], tmp[resp_col], num_ids)
 
-        out = out.join(tmp, how="left")
+    # the whole frame is built once, already on the 1..num_ids index
+    return pd.DataFrame(columns, index=pd.RangeIndex(1, num_ids + 1, name="id"))
 
-    # Ensure 1..1000 index
-    out = out.reindex(range(1, 1001))
-    return out
 
+def _place_by_id(ids, values, num_ids):
+    ids = ids.to_numpy()
+    values = values.to_numpy()
+    keep = (ids >= 1) & (ids <= num_ids)
 
-def check_credit(df):
-    # survey question columns only
-    question_cols = [c for c in df.columns if c != "name"]
+    pos = ids[keep] - 1
+
+    numeric = values.dtype.kind in "iuf"
+    out = np.full(num_ids, np.nan, dtype=np.float64 if numeric else object)
+    out[pos] = values[keep]
 
-    def is_valid_answer(colname, series):
-        s = series.astype("string")
-        valid = s.notna() & (s.str.strip() != "")
+    # ints only stay ints if every id got a value (otherwise NaN forces float)
+    if values.dtype.kind in "iu" and np.bincount(pos, minlength=num_ids).all():
+        out = out.astype(values.dtype)
+    return out
 
-        # genres rule
-        if colname == "favorite3":
-            valid = valid & (s.str.strip() != "(no genres listed)")
 
-        return valid
+# answers that don't count even though they aren't blank, per question
+INVALID_ANSWERS = {
+    "favorite3": {"(no genres listed)"},
+}
 
-    # validity matrix
-    valid_df = pd.DataFrame(
-        {c: is_valid_answer(c, df[c]) for c in question_cols},
-        index=df.index
-    )
+
+def check_credit(df):
+    # survey question columns only
+    question_cols = [c for c in df.columns if c != "name"]
+    validity = ValidityMatrix.from_frame(df, question_cols)
 
     # 5 points if student answered at least 50% of questions
     num_questions = len(question_cols)
-    student_bonus = (valid_df.sum(axis=1) >= 0.5 * num_questions).astype(int) * 5
+    student_bonus = (validity.per_student() >= 0.5 * num_questions).astype(int) * 5
 
     # class-wide bonus: count questions >=90%, cap at 2
-    class_bonus = min(2, (valid_df.mean(axis=0) >= 0.9).sum())
+    class_bonus = min(2, (validity.per_question() / len(df) >= 0.9).sum())
 
     ec = (student_bonus + class_bonus).astype(int)
 
@@ -196,115 +350,463 @@ def check_credit(df):
         index=df.index
     )
 
+
+class ValidityMatrix:
+    # which students gave a valid answer to which questions, packed 8 per byte
+    # both student-major and question-major so either count is a popcount
+
+    def __init__(self, valid):
+        self.num_students, self.num_questions = valid.shape
+        self.by_student = np.packbits(valid, axis=1)
+        self.by_question = np.packbits(valid.T, axis=1)
+
+    @classmethod
+    def from_frame(cls, df, question_cols, invalid=None):
+        invalid = INVALID_ANSWERS if invalid is None else invalid
+        valid = np.zeros((len(df), len(question_cols)), dtype=bool)
+        for j, col in enumerate(question_cols):
+            valid[:, j] = _valid_answers(df[col], invalid.get(col, set()))
+        return cls(valid)
+
+    def per_student(self):
+        return np.bitwise_count(self.by_student).sum(axis=1, dtype=np.int64)
+
+    def per_question(self):
+        return np.bitwise_count(self.by_question).sum(axis=1, dtype=np.int64)
+
+
+def _valid_answers(s, invalid):
+    # rules are checked once per distinct answer; missing answers are invalid
+    codes, uniques = pd.factorize(s)
+    ok = np.array([str(u).strip() not in invalid and str(u).strip() != "" for u in uniques], dtype=bool)
+    return np.append(ok, False)[codes]
+
+
 # ---------------------------------------------------------------------
 # QUESTION 3
 # ---------------------------------------------------------------------
 
 
-def most_popular_procedure(pets, procedure_history):
+def most_popular_procedure(pets, procedure_history, db=None):
+    if isinstance(db, PetsSQL):
+        return db.most_popular_procedure()
+    db = PetsDB(pets=pets, procedure_history=procedure_history) if db is None else db
+
     # keep only procedures for pets that exist in pets
-    merged = procedure_history.merge(
-        pets[["PetID"]],
-        on="PetID",
-        how="inner"
-    )
+    has_pet = db.history_pet >= 0
     # most common ProcedureType
-    return merged["ProcedureType"].value_counts().idxmax()
+    return db.procedure_history["ProcedureType"][has_pet].value_counts().idxmax()
 
 
-def pet_name_by_owner(owners, pets):
-    # Pet names per OwnerID (list)
-    pet_lists = pets.groupby("OwnerID")["Name"].apply(list)
+def pet_name_by_owner(owners, pets, db=None):
+    if isinstance(db, PetsSQL):
+        return db.pet_name_by_owner()
+    db = PetsDB(owners=owners, pets=pets) if db is None else db
 
-    # Ensure every owner appears (owners with no pets -> empty list)
-    pet_lists = pet_lists.reindex(owners["OwnerID"], fill_value=[])
+    # Replace OwnerID index with owner first name (not unique is fine);
+    # single pet -> string, multiple pets -> list, no pets -> empty list
+    return db.pets_by_owner.to_series(
+        index=pd.Index(db.owners["Name"].to_numpy(), name="OwnerID"),
+        name="Name"
+    )
 
-    # Replace OwnerID index with owner first name (not unique is fine)
-    owner_first = owners.set_index("OwnerID")["Name"]
-    out = pet_lists.rename(index=owner_first)
 
-    # Single pet -> string, multiple pets -> list
-    out = out.apply(lambda xs: xs[0] if isinstance(xs, list) and len(xs) == 1 else xs)
+def total_cost_per_city(owners, pets, procedure_history, procedure_detail, db=None):
+    if isinstance(db, PetsSQL):
+        return db.total_cost_per_city()
+    if db is None:
+        db = PetsDB(owners, pets, procedure_history, procedure_detail)
 
-    return out
+    # smallest-first: owner -> city codes gathered onto pets, then onto history rows
+    city_codes, cities = pd.factorize(db.owners["City"])
+    pet_city = _gather(city_codes, db.pet_owner, fill=-1)
+    history_city = _gather(pet_city, db.history_pet, fill=-1)
 
-def total_cost_per_city(owners, pets, procedure_history, procedure_detail):
-    # Pet -> Owner -> City
-    pet_city = pets.merge(
-        owners[["OwnerID", "City"]],
-        on="OwnerID",
-        how="left"
-    )[["PetID", "City"]]
-
-    # Procedure history + City
-    ph_city = procedure_history.merge(pet_city, on="PetID", how="left")
-
-    # Add prices (merge on multiple columns)
-    full = ph_city.merge(
-        procedure_detail[["ProcedureType", "ProcedureSubCode", "Price"]],
-        on=["ProcedureType", "ProcedureSubCode"],
-        how="left"
+    # Add prices through the (ProcedureType, ProcedureSubCode) index
+    price = pd.api.extensions.take(
+        db.procedure_detail["Price"].to_numpy(), db.history_procedure, allow_fill=True
     )
 
     # Sum by city, and include cities with zero spend
+    has_city = history_city >= 0
     city_totals = (
-        full.groupby("City")["Price"].sum()
-        .reindex(owners["City"].unique(), fill_value=0)
-        .sort_index()
+        pd.Series(price[has_city], name="Price")
+          .groupby(pd.Index(cities[history_city[has_city]], name="City")).sum()
+          .reindex(db.owners["City"].unique(), fill_value=0)
+          .sort_index()
     )
+    city_totals.index.name = "City"
 
     return city_totals
 
 
+class GroupedCollection:
+    # variable-length groups in CSR form: all values sorted by group, plus an
+    # offsets array so group g is values[offsets[g]:offsets[g + 1]]. No Python
+    # list exists per group until the collection is presented with to_series.
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    @classmethod
+    def from_codes(cls, codes, values, num_groups):
+        # codes[i] is the group of values[i]; -1 drops the value
+        codes = np.asarray(codes)
+        keep = codes >= 0
+        codes, values = codes[keep], np.asarray(values)[keep]
+        order = np.argsort(codes, kind="stable")   # keeps original order within a group
+        sizes = np.bincount(codes, minlength=num_groups)
+        return cls(values[order], np.concatenate([[0], np.cumsum(sizes)]))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, g):
+        return self.values[self.offsets[g]:self.offsets[g + 1]]
+
+    def sizes(self):
+        return np.diff(self.offsets)
+
+    def to_series(self, index=None, name=None, unwrap_single=True):
+        # one group -> one cell: a list, or the bare value for singletons
+        cells = [self[g].tolist() for g in range(len(self))]
+        if unwrap_single:
+            cells = [xs[0] if len(xs) == 1 else xs for xs in cells]
+        return pd.Series(cells, index=index, name=name, dtype=object)
+
+
+def _gather(values, positions, fill):
+    # values[positions], with -1 positions (no match) mapped to `fill`
+    out = np.asarray(values)[positions]
+    out[positions < 0] = fill
+    return out
+
+
+class PetsDB:
+    # the pets/procedures tables loaded once, with hash indexes on PetID,
+    # OwnerID and (ProcedureType, ProcedureSubCode). Each join is stored as an
+    # integer array of row positions (-1 = no match) and built on first use,
+    # so a join chain is just a couple of integer gathers.
+
+    def __init__(self, owners=None, pets=None, procedure_history=None, procedure_detail=None):
+        self.owners = owners
+        self.pets = pets
+        self.procedure_history = procedure_history
+        self.procedure_detail = procedure_detail
+
+    @classmethod
+    def from_dir(cls, dirname):
+        d = Path(dirname)
+        return cls(
+            pd.read_csv(d / "Owners.csv"),
+            pd.read_csv(d / "Pets.csv"),
+            pd.read_csv(d / "ProceduresHistory.csv"),
+            pd.read_csv(d / "ProceduresDetails.csv"),
+        )
+
+    @cached_property
+    def pet_index(self):
+        return pd.Index(self.pets["PetID"])
+
+    @cached_property
+    def owner_index(self):
+        return pd.Index(self.owners["OwnerID"])
+
+    @cached_property
+    def procedure_index(self):
+        return pd.MultiIndex.from_frame(self.procedure_detail[["ProcedureType", "ProcedureSubCode"]])
+
+    @cached_property
+    def pet_owner(self):
+        # row in owners for each pet
+        return self.owner_index.get_indexer(self.pets["OwnerID"])
+
+    @cached_property
+    def pets_by_owner(self):
+        # pet names grouped by owner row, in pets file order
+        return GroupedCollection.from_codes(self.pet_owner, self.pets["Name"].to_numpy(), len(self.owners))
+
+    @cached_property
+    def history_pet(self):
+        # row in pets for each procedure
+        return self.pet_index.get_indexer(self.procedure_history["PetID"])
+
+    @cached_property
+    def history_procedure(self):
+        # row in procedure_detail for each procedure
+        keys = pd.MultiIndex.from_frame(self.procedure_history[["ProcedureType", "ProcedureSubCode"]])
+        return self.procedure_index.get_indexer(keys)
+
+
+class PetsSQL:
+    # the same four tables in SQLite (on disk or ":memory:"), indexed on the join
+    # keys. The three queries push their joins and aggregations into SQL and
+    # only pull back the (small) results. Pass one as db= to the functions above;
+    # close() it (or use it in a with block) when done.
+
+    TABLES = {
+        "owners": "Owners.csv",
+        "pets": "Pets.csv",
+        "procedure_history": "ProceduresHistory.csv",
+        "procedure_detail": "ProceduresDetails.csv",
+    }
+
+    INDEXES = [
+        "CREATE INDEX IF NOT EXISTS owners_id ON owners (OwnerID)",
+        "CREATE INDEX IF NOT EXISTS pets_id ON pets (PetID)",
+        "CREATE INDEX IF NOT EXISTS pets_owner ON pets (OwnerID)",
+        "CREATE INDEX IF NOT EXISTS history_pet ON procedure_history (PetID)",
+        "CREATE INDEX IF NOT EXISTS history_proc ON procedure_history (ProcedureType, ProcedureSubCode)",
+        "CREATE INDEX IF NOT EXISTS detail_proc ON procedure_detail (ProcedureType, ProcedureSubCode)",
+    ]
+
+    def __init__(self, path=":memory:"):
+        self.conn = sqlite3.connect(path)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @classmethod
+    def from_dir(cls, dirname, path=":memory:", chunksize=100_000):
+        # CSVs are streamed in chunks, so the files never need to fit in memory
+        db = cls(path)
+        for table, fname in cls.TABLES.items():
+            db.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            for chunk in pd.read_csv(Path(dirname) / fname, chunksize=chunksize):
+                chunk.to_sql(table, db.conn, if_exists="append", index=False)
+        db._create_indexes()
+        return db
+
+    @classmethod
+    def from_frames(cls, owners, pets, procedure_history, procedure_detail, path=":memory:"):
+        db = cls(path)
+        frames = [owners, pets, procedure_history, procedure_detail]
+        for table, df in zip(cls.TABLES, frames):
+            df.to_sql(table, db.conn, if_exists="replace", index=False)
+        db._create_indexes()
+        return db
+
+    def _create_indexes(self):
+        for stmt in self.INDEXES:
+            self.conn.execute(stmt)
+        self.conn.commit()
+
+    def most_popular_procedure(self):
+        # ties go to the type seen first, as with value_counts().idxmax()
+        query = """
+            SELECT h.ProcedureType, COUNT(*) AS n, MIN(h.rowid) AS first_row
+            FROM procedure_history h
+            JOIN pets p ON p.PetID = h.PetID
+            GROUP BY h.ProcedureType
+            ORDER BY n DESC, first_row
+            LIMIT 1
+        """
+        return self.conn.execute(query).fetchone()[0]
+
+    def pet_name_by_owner(self):
+        # one row per (owner, pet) in owner/pet file order; owners without pets
+        # come back once with a NULL pet
+        query = """
+            SELECT o.rowid AS owner_row, o.Name AS owner, p.Name AS pet
+            FROM owners o
+            LEFT JOIN pets p ON p.OwnerID = o.OwnerID
+            ORDER BY o.rowid, p.rowid
+        """
+        rows = pd.read_sql_query(query, self.conn)
+        codes, owner_rows = pd.factorize(rows["owner_row"])
+        owners = rows.drop_duplicates("owner_row")
+
+        has_pet = rows["pet"].notna().to_numpy()
+        grouped = GroupedCollection.from_codes(
+            np.where(has_pet, codes, -1), rows["pet"].to_numpy(), len(owner_rows)
+        )
+        return grouped.to_series(
+            index=pd.Index(owners["owner"].to_numpy(), name="OwnerID"),
+            name="Name"
+        )
+
+    def total_cost_per_city(self):
+        query = """
+            SELECT c.City, COALESCE(t.Price, 0) AS Price
+            FROM (SELECT DISTINCT City FROM owners) c
+            LEFT JOIN (
+                SELECT o.City, SUM(d.Price) AS Price
+                FROM procedure_history h
+                JOIN pets p ON p.PetID = h.PetID
+                JOIN owners o ON o.OwnerID = p.OwnerID
+                JOIN procedure_detail d
+                  ON d.ProcedureType = h.ProcedureType
+                 AND d.ProcedureSubCode = h.ProcedureSubCode
+                GROUP BY o.City
+            ) t ON t.City = c.City
+            ORDER BY c.City
+        """
+        return pd.read_sql_query(query, self.conn, index_col="City")["Price"]
+
+
+def check_sql_parity(dirname):
+    # runs all three questions through the pandas path and the SQLite path and
+    # raises AssertionError on any difference (explicitly, so it still checks
+    # under python -O)
+    d = Path(dirname)
+    owners = pd.read_csv(d / "Owners.csv")
+    pets = pd.read_csv(d / "Pets.csv")
+    procedure_history = pd.read_csv(d / "ProceduresHistory.csv")
+    procedure_detail = pd.read_csv(d / "ProceduresDetails.csv")
+
+    with PetsSQL.from_dir(d) as sql:
+        expected = most_popular_procedure(pets, procedure_history)
+        got = most_popular_procedure(None, None, db=sql)
+        if got != expected:
+            raise AssertionError(f"most_popular_procedure: SQL gave {got!r}, pandas {expected!r}")
+        pd.testing.assert_series_equal(
+            pet_name_by_owner(owners, pets),
+            pet_name_by_owner(None, None, db=sql)
+        )
+        pd.testing.assert_series_equal(
+            total_cost_per_city(owners, pets, procedure_history, procedure_detail),
+            total_cost_per_city(None, None, None, None, db=sql)
+        )
+    return True
+
+
 # ---------------------------------------------------------------------
 # QUESTION 4
 # ---------------------------------------------------------------------
 
 
-def average_seller(sales):
-    out = sales.pivot_table(
-        index="Name",
-        values="Total",
-        aggfunc="mean"
-    )
-    out = out.rename(columns={"Total": "Average Sales"}).fillna(0)
-    return out
+def average_seller(sales, cube=None):
+    cube = SalesCube.from_sales(sales) if cube is None else cube
+    return cube.average_seller()
 
-def product_name(sales):
-    return sales.pivot_table(
-        index="Name",
-        columns="Product",
-        values="Total",
-        aggfunc="sum"
-    )
+def product_name(sales, cube=None):
+    cube = SalesCube.from_sales(sales) if cube is None else cube
+    return cube.product_name()
 
-def count_product(sales):
-    out = sales.pivot_table(
-        index=["Product", "Name"],
-        columns="Date",
-        values="Total",
-        aggfunc="count"
-    )
-    
-    out = out.fillna(0)
-    return out
+def count_product(sales, cube=None):
+    cube = SalesCube.from_sales(sales) if cube is None else cube
+    return cube.count_product()
 
-def total_by_month(sales):
-    # make a copy so we don't mutate the original df
-    df = sales.copy()
-    
-    # extract month name from Date
-    df["Month"] = pd.to_datetime(df["Date"]).dt.month_name()
-    
-    # pivot table
-    out = df.pivot_table(
-        index=["Name", "Product"],
-        columns="Month",
-        values="Total",
-        aggfunc="sum"
-    )
-    
-    # replace NaNs with 0
-    out = out.fillna(0)
-    
-    return out
\ No newline at end of file
+def total_by_month(sales, cube=None):
+    cube = SalesCube.from_sales(sales) if cube is None else cube
+    return cube.total_by_month()
+
+
+class SalesCube:
+    # sum and count of Total at (Name, Product, Date) granularity, built with one
+    # groupby. The four pivots above are roll-ups of this cube, so raw rows are
+    # only touched once, and new batches merge in with add().
+
+    KEYS = ["Name", "Product", "Date"]
+
+    def __init__(self, cube):
+        self.cube = cube
+
+    @classmethod
+    def from_sales(cls, sales):
+        return cls(sales.groupby(cls.KEYS)["Total"].agg(["sum", "count"]))
+
+    def add(self, sales):
+        batch = SalesCube.from_sales(sales).cube
+        self.cube = pd.concat([self.cube, batch]).groupby(level=self.KEYS).sum()
+        return self
+
+    def average_seller(self):
+        by_name = self.cube.groupby(level="Name").sum()
+        out = (by_name["sum"] / by_name["count"]).to_frame("Average Sales")
+        return out.fillna(0)
+
+    def product_name(self):
+        totals = self.cube["sum"].groupby(level=["Name", "Product"]).sum()
+        return totals.unstack("Product").astype(float)
+
+    def count_product(self):
+        counts = self.cube["count"].reorder_levels(["Product", "Name", "Date"])
+        return counts.unstack("Date", fill_value=0).sort_index().astype(float)
+
+    def total_by_month(self):
+        # dates are parsed once with a detected format; month names are integer math
+        dates = pd.Series(self.cube.index.get_level_values("Date"))
+        months = month_names(parse_dates(dates))
+
+        names = self.cube.index.get_level_values("Name")
+        products = self.cube.index.get_level_values("Product")
+        totals = self.cube["sum"].groupby(
+            [names, products, pd.Index(months, name="Month")]
+        ).sum()
+        return totals.unstack("Month", fill_value=0).astype(float)
+
+
+# ---------------------------------------------------------------------
+# Date helpers: detect a column's format once, parse with it explicitly,
+# and cache the parsed datetime64 array by the column's contents
+# ---------------------------------------------------------------------
+
+
+DATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%m.%d.%Y",
+    "%m/%d/%Y",
+    "%d.%m.%Y",
+    "%d/%m/%Y",
+    "%m/%d/%Y %H:%M",
+]
+
+_MONTH_NAMES = np.array(calendar.month_name[1:])
+
+# most recently parsed columns, keyed by format and an order-sensitive
+# digest of the contents; see parse_dates
+_PARSED_DATES = OrderedDict()
+_PARSED_DATES_MAX = 4
+
+
+def detect_date_format(values, sample=200):
+    # first format that parses every value in a sample of the distinct strings
+    sample = pd.Series(pd.unique(pd.Series(values).dropna()))[:sample].astype(str)
+    for fmt in DATE_FORMATS:
+        try:
+            pd.to_datetime(sample, format=fmt)
+        except (ValueError, TypeError):
+            continue
+        return fmt
+    return None
+
+
+def parse_dates(s, fmt=None):
+    # datetime64[ns] array for a string column; unparseable values become NaT
+    s = pd.Series(s)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.to_numpy(dtype="datetime64[ns]")
+
+    hashes = pd.util.hash_pandas_object(s, index=False).to_numpy()
+    key = (fmt, len(s), hashlib.blake2b(hashes.tobytes(), digest_size=16).digest())
+    if key in _PARSED_DATES:
+        _PARSED_DATES.move_to_end(key)
+        return _PARSED_DATES[key]
+
+    fmt = detect_date_format(s) if fmt is None else fmt
+    codes, uniques = pd.factorize(s)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=fmt, errors="coerce")
+    parsed = np.append(parsed.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT"))[codes]
+
+    # shared with later callers, so hand it out read-only
+    parsed.setflags(write=False)
+    _PARSED_DATES[key] = parsed
+    while len(_PARSED_DATES) > _PARSED_DATES_MAX:
+        _PARSED_DATES.popitem(last=False)
+    return parsed
+
+
+def month_names(dt):
+    # calendar month name per value (months since 1970, mod 12); None for NaT
+    months = dt.astype("datetime64[M]").astype(np.int64) % 12
+    return np.where(np.isnat(dt), None, _MONTH_NAMES[months])
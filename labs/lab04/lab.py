@@ -1,31 +1,211 @@
 # lab.py
 
 
+import hashlib
+import math
+from collections import OrderedDict, namedtuple
 import pandas as pd
 import numpy as np
 import io
 from pathlib import Path
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from itertools import repeat
 
 
 # ---------------------------------------------------------------------
-# QUESTION 1
+# Date helpers: detect a column's format once, parse with it explicitly,
+# and cache the parsed datetime64 array by the column's contents
 # ---------------------------------------------------------------------
 
 
-def prime_time_logins(login):
-    # Parse timestamps
-    t = pd.to_datetime(login["Time"], errors="coerce")
+DATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%m.%d.%Y",
+    "%m/%d/%Y",
+    "%d.%m.%Y",
+    "%d/%m/%Y",
+    "%m/%d/%Y %H:%M",
+]
+
+_NS_PER_HOUR = 3_600 * 10**9
+_NS_PER_DAY = 24 * _NS_PER_HOUR
+
+# most recently parsed columns, keyed by format and an order-sensitive
+# digest of the contents; see parse_dates
+_PARSED_DATES = OrderedDict()
+_PARSED_DATES_MAX = 4
+
+
+def detect_date_format(values, sample=200):
+    # first format that parses every value in a sample of the distinct strings
+    sample = pd.Series(pd.unique(pd.Series(values).dropna()))[:sample].astype(str)
+    for fmt in DATE_FORMATS:
+        try:
+            pd.to_datetime(sample, format=fmt)
+        except (ValueError, TypeError):
+            continue
+        return fmt
+    return None
+
+
+def parse_dates(s, fmt=None, cache=True):
+    # datetime64[ns] array for a string column; unparseable values become NaT.
+    # Pass cache=False for one-off chunks (e.g. when streaming a log).
+    s = pd.Series(s)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.to_numpy(dtype="datetime64[ns]")
+
+    if cache:
+        hashes = pd.util.hash_pandas_object(s, index=False).to_numpy()
+        key = (fmt, len(s), hashlib.blake2b(hashes.tobytes(), digest_size=16).digest())
+        if key in _PARSED_DATES:
+            _PARSED_DATES.move_to_end(key)
+            return _PARSED_DATES[key]
+
+    fmt = detect_date_format(s) if fmt is None else fmt
+    codes, uniques = pd.factorize(s)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=fmt, errors="coerce")
+    parsed = np.append(parsed.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT"))[codes]
+
+    if cache:
+        # shared with later callers, so hand it out read-only
+        parsed.setflags(write=False)
+        _PARSED_DATES[key] = parsed
+        while len(_PARSED_DATES) > _PARSED_DATES_MAX:
+            _PARSED_DATES.popitem(last=False)
+    return parsed
+
+
+def hour_of_day(dt):
+    # -1 for NaT
+    ns = dt.astype(np.int64)
+    return np.where(np.isnat(dt), -1, (ns // _NS_PER_HOUR) % 24)
+
+
+def days_since(dt, now):
+    # whole days from each value up to `now` (floored, like Timedelta.days); NaN for NaT
+    now = pd.Timestamp(now).as_unit("ns").value
+    days = (now - dt.astype(np.int64)) // _NS_PER_DAY
+    return np.where(np.isnat(dt), np.nan, days)
 
-    # Prime time: 16:00 (inclusive) to 20:00 (exclusive)
-    is_prime = (t.dt.hour >= 16) & (t.dt.hour < 20)
 
-    # Count prime-time logins per user
-    out = is_prime.groupby(login["Login Id"]).sum().to_frame("Time")
-    out["Time"] = out["Time"].astype(int)
-    out.index.name = "Login Id"
+# ---------------------------------------------------------------------
+# QUESTION 1
+# ---------------------------------------------------------------------
 
-    return out
+
+def prime_time_logins(login):
+    # Count prime-time logins per user
+    return LoginStats().update(login, cache=True).prime_time_logins()
+
+
+class LoginStats:
+    # per-user login accumulators in flat arrays indexed by an interned user
+    # number: prime-time count, total (parseable) logins and first-seen time.
+    # Chunks are folded in with update(); partial states from other workers
+    # combine with merge(). Memory grows with the number of users, not logins.
+
+    def __init__(self, fmt=None):
+        self.fmt = fmt
+        self.user_index = {}
+        self.users = []
+        self.prime = np.zeros(0, dtype=np.int64)
+        self.total = np.zeros(0, dtype=np.int64)
+        self.first_seen = np.zeros(0, dtype=np.int64)
+
+    def _intern(self, ids):
+        # global user numbers for a chunk's ids, growing the arrays for new users
+        codes, uniques = pd.factorize(ids)
+        for user in uniques:
+            if user not in self.user_index:
+                self.user_index[user] = len(self.users)
+                self.users.append(user)
+
+        grow = len(self.users) - len(self.prime)
+        if grow:
+            self.prime = np.concatenate([self.prime, np.zeros(grow, dtype=np.int64)])
+            self.total = np.concatenate([self.total, np.zeros(grow, dtype=np.int64)])
+            self.first_seen = np.concatenate([self.first_seen, np.full(grow, np.iinfo(np.int64).max)])
+
+        # missing ids (code -1) stay -1 and are dropped by update, like groupby
+        to_global = np.array([self.user_index[u] for u in uniques], dtype=np.int64)
+        users = np.full(len(codes), -1, dtype=np.int64)
+        users[codes >= 0] = to_global[codes[codes >= 0]]
+        return users
+
+    def update(self, chunk, cache=False):
+        # cache=True when chunk is a whole table that may be seen again (the
+        # parsed Time column is then reused); streamed chunks skip the cache
+        if len(chunk) == 0:
+            return self
+
+        users = self._intern(chunk["Login Id"])
+        if cache:
+            t = parse_dates(chunk["Time"], fmt=self.fmt)
+        else:
+            if self.fmt is None:
+                self.fmt = detect_date_format(chunk["Time"])
+            t = parse_dates(chunk["Time"], fmt=self.fmt, cache=False)
+        seen = ~np.isnat(t) & (users >= 0)
+
+        # Prime time: 16:00 (inclusive) to 20:00 (exclusive)
+        hours = hour_of_day(t)
+        is_prime = (hours >= 16) & (hours < 20) & seen
+
+        n = len(self.users)
+        self.prime += np.bincount(users[is_prime], minlength=n)
+        self.total += np.bincount(users[seen], minlength=n)
+        np.minimum.at(self.first_seen, users[seen], t[seen].astype(np.int64))
+        return self
+
+    def merge(self, other):
+        users = self._intern(pd.Series(other.users, dtype=object))
+        np.add.at(self.prime, users, other.prime)
+        np.add.at(self.total, users, other.total)
+        np.minimum.at(self.first_seen, users, other.first_seen)
+        return self
+
+    def _sorted(self):
+        order = np.argsort(np.array(self.users), kind="stable")
+        index = pd.Index(np.array(self.users)[order], name="Login Id")
+        return order, index
+
+    def prime_time_logins(self):
+        order, index = self._sorted()
+        return pd.DataFrame({"Time": self.prime[order]}, index=index)
+
+    def count_frequency(self, now):
+        order, index = self._sorted()
+        never = self.total[order] == 0
+        first = np.where(never, np.iinfo(np.int64).min, self.first_seen[order]).view("datetime64[ns]")
+
+        # Logins per day
+        frequency = self.total[order] / days_since(first, now)
+        return pd.Series(frequency, index=index)
+
+
+def _login_stats_file(fp, chunksize=1_000_000):
+    # CSV or gzipped CSV (compression is inferred from the extension)
+    stats = LoginStats()
+    for chunk in pd.read_csv(fp, chunksize=chunksize):
+        stats.update(chunk)
+    return stats
+
+
+def stream_login_stats(paths, chunksize=1_000_000, n_workers=1):
+    # one LoginStats per file, in worker processes if asked; partial states
+    # are merged in file order
+    paths = [paths] if isinstance(paths, (str, Path)) else list(paths)
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            partials = list(pool.map(_login_stats_file, paths, repeat(chunksize)))
+    else:
+        partials = [_login_stats_file(fp, chunksize) for fp in paths]
+    return reduce(LoginStats.merge, partials[1:], partials[0])
 
 
 # ---------------------------------------------------------------------
@@ -37,29 +217,67 @@ def count_frequency(login):
     # Fixed "current time"
     now = pd.Timestamp("2024-01-31 23:59:00")
 
-    # Ensure Time is datetime
-    t = pd.to_datetime(login["Time"], errors="coerce")
-
-    # Aggregate per user: total logins + first login time
-    agg = (
-        login.assign(Time=t)
-             .groupby("Login Id")
-             .agg(
-                 total_logins=("Time", "count"),
-                 first_login=("Time", "min")
-             )
-    )
-
-    # Compute full days since first login
-    days = (now - agg["first_login"]).dt.days
-
-    # Logins per day
-    frequency = agg["total_logins"] / days
+    # Logins per day since each user's first login
+    frequency = LoginStats().update(login, cache=True).count_frequency(now)
 
     frequency.name = None  # match typical otter expectations
     return frequency
 
 
+# ---------------------------------------------------------------------
+# P-value helpers: exact tails when the null is a known binomial,
+# otherwise batched Monte Carlo that stops once the decision is clear
+# ---------------------------------------------------------------------
+
+
+PValue = namedtuple("PValue", ["p_value", "num_simulations", "exact"])
+
+# z for the two-sided 99% interval used by adaptive_p_value
+_Z_99 = 2.576
+
+
+def binomial_tail(n, p, observed):
+    # exact P(X >= observed) for X ~ Binomial(n, p), summed in log space
+    if observed <= 0:
+        return 1.0
+    if observed > n or p <= 0:
+        return 0.0
+    if p >= 1:
+        return 1.0
+    log_p, log_q = math.log(p), math.log1p(-p)
+    log_n = math.lgamma(n + 1)
+    terms = [
+        log_n - math.lgamma(k + 1) - math.lgamma(n - k + 1) + k * log_p + (n - k) * log_q
+        for k in range(observed, n + 1)
+    ]
+    top = max(terms)
+    return min(1.0, math.exp(top) * math.fsum(math.exp(t - top) for t in terms))
+
+
+def binomial_p_value(n, p, observed):
+    return PValue(binomial_tail(n, p, observed), 0, True)
+
+
+def adaptive_p_value(simulate, observed, alpha=0.05, batch_size=2_000, max_sims=100_000, z=_Z_99):
+    # simulate(size) returns `size` draws of the test statistic under the null.
+    # Draw in batches and stop as soon as the Wilson interval on the p-value
+    # lies entirely on one side of alpha, or when max_sims is reached.
+    hits = 0
+    total = 0
+    while total < max_sims:
+        size = min(batch_size, max_sims - total)
+        hits += int(np.count_nonzero(simulate(size) >= observed))
+        total += size
+
+        p_hat = hits / total
+        denom = 1 + z**2 / total
+        center = (p_hat + z**2 / (2 * total)) / denom
+        half = z * np.sqrt(p_hat * (1 - p_hat) / total + z**2 / (4 * total**2)) / denom
+        if center + half < alpha or center - half > alpha:
+            break
+    return PValue(hits / total, total, False)
+
+
 # ---------------------------------------------------------------------
 # QUESTION 3
 # ---------------------------------------------------------------------
@@ -69,12 +287,21 @@ def cookies_null_hypothesis():
     return [1, 2]
 
                          
-def cookies_p_value(N):
+def _binomial_source(seed=None):
+    # np.random and Generators share the binomial() signature
+    return np.random if seed is None else np.random.default_rng(seed)
+
+
+def cookies_p_value(N=None, seed=None):
     n_cookies = 250
     p_burnt = 0.04
     observed = 15
-    
-    sims = np.random.binomial(n=n_cookies, p=p_burnt, size=N)
+
+    # the null is Binomial(250, 0.04), so without N the tail is exact
+    if N is None:
+        return binomial_p_value(n_cookies, p_burnt, observed).p_value
+
+    sims = _binomial_source(seed).binomial(n=n_cookies, p=p_burnt, size=N)
     return np.mean(sims >= observed)
 
 
@@ -116,52 +343,253 @@ def superheroes_observed_statistic(heroes):
     is_good = heroes["Alignment"].astype(str).str.lower().eq("good")
     # proportion of good among BHBE
     return is_good[bhbe].mean()
-    
-def simulate_bhbe_null(heroes, N):
-    bhbe = bhbe_col(heroes)
-    m = int(bhbe.sum())  # number of BHBE characters
 
+
+def _bhbe_null(heroes):
+    # (m, p, observed good count): under the null the number of good BHBE
+    # characters is Binomial(m, p) with p the overall proportion good
+    bhbe = bhbe_col(heroes)
     is_good = heroes["Alignment"].astype(str).str.lower().eq("good")
-    p = is_good.mean()   # overall proportion good
+    return int(bhbe.sum()), is_good.mean(), int(is_good[bhbe].sum())
+
+    
+def simulate_bhbe_null(heroes, N, seed=None):
+    m, p, _ = _bhbe_null(heroes)
 
     # simulate good counts in BHBE group under null, then convert to proportions
-    sims = np.random.binomial(n=m, p=p, size=N)
+    sims = _binomial_source(seed).binomial(n=m, p=p, size=N)
     return sims / m
 
-def superheroes_p_value(heroes):
-    obs = superheroes_observed_statistic(heroes)
-    sims = simulate_bhbe_null(heroes, 100_000)
 
-    # One-sided: "greater" (BHBE good proportion is higher)
-    pval = np.mean(sims >= obs)
+def superheroes_test(heroes, alpha=0.01, method="exact", max_sims=100_000, seed=None):
+    # One-sided: "greater" (BHBE good proportion is higher).
+    # method="exact" uses the binomial tail; "adaptive" simulates counts in
+    # batches until the p-value is clearly on one side of alpha.
+    m, p, observed = _bhbe_null(heroes)
+    if method == "exact":
+        return binomial_p_value(m, p, observed)
+    if method == "adaptive":
+        source = _binomial_source(seed)
+        return adaptive_p_value(
+            lambda size: source.binomial(n=m, p=p, size=size),
+            observed, alpha=alpha, max_sims=max_sims,
+        )
+    raise ValueError(f"unknown method {method!r}; use 'exact' or 'adaptive'")
+
+
+def superheroes_p_value(heroes, method="exact"):
+    pval = superheroes_test(heroes, alpha=0.01, method=method).p_value
     decision = "Reject" if pval < 0.01 else "Fail to reject"
     return [pval, decision]
 
 
+# ---------------------------------------------------------------------
+# Permutation engine: code the labels once, shuffle codes in batches and
+# get every permutation's group means from matrix products
+# ---------------------------------------------------------------------
+
+
+# permutations per independent random stream; fixed so that the streams,
+# and therefore the results, do not depend on the number of workers
+PERMUTATION_BLOCK = 250
+
+# the engine a worker process was started with; see PermutationEngine._run_blocks
+_WORKER_ENGINE = None
+
+
+def _seed_sequence(seed=None):
+    # None draws the entropy from the global np.random state, so
+    # np.random.seed() still makes unseeded runs repeatable
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if seed is None:
+        seed = int(np.random.randint(2**32, dtype=np.uint32))
+    return np.random.SeedSequence(seed)
+
+
+def _set_worker_engine(engine):
+    global _WORKER_ENGINE
+    _WORKER_ENGINE = engine
+
+
+def _in_worker(func, *args):
+    return func(_WORKER_ENGINE, *args)
+
+
+def _permutation_block(engine, statistic, size, seed_seq):
+    rng = np.random.default_rng(seed_seq)
+    return np.concatenate([statistic(engine.group_means(perms)) for perms in engine.batches(size, rng)])
+
+
+def _exceedance_block(engine, statistic, size, seed_seq, observed):
+    # per-column count of permuted statistics >= observed; same stream as
+    # _permutation_block, without keeping the block's statistics around
+    rng = np.random.default_rng(seed_seq)
+    counts = np.zeros(engine.values.shape[1], dtype=np.int64)
+    for perms in engine.batches(size, rng):
+        counts += np.count_nonzero(statistic(engine.group_means(perms)) >= observed, axis=0)
+    return counts
+
+
+class PermutationEngine:
+    # Permutation tests on group means. Labels are coded against `groups`
+    # once (rows outside them are coded -1 and still take part in the
+    # shuffle). A batch is a (rows x n) array of independently shuffled
+    # codes; the group sums of every permutation and value column come from
+    # one (rows x n) @ (n x k) product per group. Group sizes never change
+    # under permutation, so means are sums / counts. Batches are sized so
+    # the codes, the indicator matrix and the per-column sums stay under
+    # chunk_bytes. Every column shares the same permutations, so testing
+    # many columns costs one wider matrix product, not more shuffles.
+    #
+    # distribution() splits N into PERMUTATION_BLOCK-sized blocks, each with
+    # its own SeedSequence.spawn child stream, runs them in worker processes
+    # if asked and concatenates in block order: a given seed yields the same
+    # distribution for any n_workers.
+
+    def __init__(self, labels, values, groups=None, chunk_bytes=64 * 2**20):
+        labels = np.asarray(labels, dtype=object)
+        if groups is None:
+            groups = pd.unique(labels)
+        self.groups = list(groups)
+        self.codes = pd.Index(self.groups).get_indexer(labels)
+
+        values = np.asarray(values, dtype=float)
+        values = values[:, None] if values.ndim == 1 else values
+        # missing values are skipped like Series.mean: they add 0 to the sums
+        # and the non-missing counts are taken per permutation
+        missing = np.isnan(values)
+        self.values = np.where(missing, 0.0, values)
+        self.present = (~missing).astype(float) if missing.any() else None
+        self.counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.groups))
+        self.chunk_bytes = chunk_bytes
+
+    def group_means(self, codes):
+        # (rows x n) codes -> (rows x groups x columns) means
+        indicators = [(codes == g).astype(float) for g in range(len(self.groups))]
+        sums = np.stack([ind @ self.values for ind in indicators], axis=1)
+        if self.present is None:
+            return sums / self.counts[:, None]
+        counts = np.stack([ind @ self.present for ind in indicators], axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    def observed(self, statistic):
+        return statistic(self.group_means(self.codes[None, :]))[0]
+
+    def batches(self, N, rng):
+        n = len(self.codes)
+        k, n_groups = self.values.shape[1], len(self.groups)
+        rows = max(1, self.chunk_bytes // (8 * (2 * n + (2 * n_groups + 1) * k)))
+        done = 0
+        while done < N:
+            size = min(rows, N - done)
+            perms = np.tile(self.codes, (size, 1))
+            rng.permuted(perms, axis=1, out=perms)
+            yield perms
+            done += size
+
+    def _run_blocks(self, func, N, statistic, seed, n_workers, *extra):
+        sizes = [PERMUTATION_BLOCK] * (N // PERMUTATION_BLOCK)
+        if N % PERMUTATION_BLOCK:
+            sizes.append(N % PERMUTATION_BLOCK)
+        streams = _seed_sequence(seed).spawn(len(sizes))
+
+        args = (repeat(statistic), sizes, streams, *map(repeat, extra))
+        if n_workers > 1 and len(sizes) > 1:
+            # the engine is pickled once per worker, not once per block
+            chunksize = max(1, len(sizes) // (4 * n_workers))
+            with ProcessPoolExecutor(n_workers, initializer=_set_worker_engine, initargs=(self,)) as pool:
+                return list(pool.map(_in_worker, repeat(func), *args, chunksize=chunksize))
+        return list(map(func, repeat(self), *args))
+
+    def distribution(self, N, statistic, seed=None, n_workers=1):
+        # (N x columns) statistics, one row per permutation
+        if N <= 0:
+            return np.empty((0, self.values.shape[1]))
+        return np.concatenate(self._run_blocks(_permutation_block, N, statistic, seed, n_workers))
+
+    def p_values(self, N, statistic, seed=None, n_workers=1):
+        # per-column P(permuted >= observed); only exceedance counts are
+        # kept, so memory does not grow with N
+        observed = self.observed(statistic)
+        counts = self._run_blocks(_exceedance_block, N, statistic, seed, n_workers, observed)
+        return np.sum(counts, axis=0) / N
+
+
+def adjust_p_values(p_values, method=None):
+    # multiple-testing corrections: None, "bonferroni" (family-wise error)
+    # or "bh" (Benjamini-Hochberg false discovery rate)
+    p = np.asarray(p_values, dtype=float)
+    m = len(p)
+    if method is None:
+        return p
+    if method == "bonferroni":
+        return np.minimum(p * m, 1.0)
+    if method == "bh":
+        order = np.argsort(p, kind="stable")
+        scaled = p[order] * m / np.arange(1, m + 1)
+        adjusted = np.empty(m)
+        adjusted[order] = np.minimum.accumulate(scaled[::-1])[::-1]
+        return np.minimum(adjusted, 1.0)
+    raise ValueError(f"unknown correction {method!r}; use None, 'bonferroni' or 'bh'")
+
+
+def abs_diff_in_means(means):
+    # |mean of first group - mean of second group|, per permutation and column
+    return np.abs(means[:, 0, :] - means[:, 1, :])
+
+
 # ---------------------------------------------------------------------
 # QUESTION 6
 # ---------------------------------------------------------------------
 
 
+FACTORIES = ("Yorkville", "Waco")
+
+
 def diff_of_means(data, col='orange'):
     york_mean = data.loc[data["Factory"] == "Yorkville", col].mean()
     waco_mean = data.loc[data["Factory"] == "Waco", col].mean()
     return abs(york_mean - waco_mean)
 
 
-def simulate_null(data, col='orange'):
-    shuffled = data.copy()
-    shuffled["Factory"] = np.random.permutation(shuffled["Factory"].values)
-    return diff_of_means(shuffled, col)
+def _factory_engine(data, col):
+    return PermutationEngine(data["Factory"], data[col], groups=FACTORIES)
+
 
+def simulate_null(data, col='orange', seed=None):
+    # one shuffle of Factory
+    return float(_factory_engine(data, col).distribution(1, abs_diff_in_means, seed=seed)[0, 0])
 
-def color_p_value(data, col='orange'):
-    observed = diff_of_means(data, col)
 
-    sims = np.array([simulate_null(data, col) for _ in range(1000)])
-    p_value = np.mean(sims >= observed)
+def color_p_value(data, col='orange', N=1000, seed=None, n_workers=1):
+    engine = _factory_engine(data, col)
+    # observed through the same code path as the simulations, so exact ties
+    # compare equal
+    observed = engine.observed(abs_diff_in_means)[0]
+    sims = engine.distribution(N, abs_diff_in_means, seed=seed, n_workers=n_workers)[:, 0]
+    return float(np.mean(sims >= observed))
 
-    return float(p_value)
+
+def color_p_values(data, cols=None, N=1000, seed=None, n_workers=1, correction=None):
+    # every colour (default: all numeric columns) against the same shuffles
+    # of Factory; one row per column with the observed statistic, p-value
+    # and, if asked, the corrected p-value
+    if cols is None:
+        cols = data.select_dtypes("number").columns
+    cols = list(cols)
+    engine = PermutationEngine(data["Factory"], data[cols], groups=FACTORIES)
+    out = pd.DataFrame(
+        {
+            "observed": engine.observed(abs_diff_in_means),
+            "p_value": engine.p_values(N, abs_diff_in_means, seed=seed, n_workers=n_workers),
+        },
+        index=pd.Index(cols),
+    )
+    if correction is not None:
+        out["p_adjusted"] = adjust_p_values(out["p_value"], correction)
+    return out
 
 
 # ---------------------------------------------------------------------
@@ -1,3 +1,5 @@
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 import plotly.express as px
@@ -66,34 +68,73 @@ def multiple_describe(df_map):
 # ---------------------------------------------------------------------
 
 
-def permutation_test(data, col, group_col, test_statistic, N=1000):
+PERMUTATION_BLOCK = 250
+
+# (data, col, group_col, test_statistic) for the current worker process
+_WORKER_TEST = None
+
+
+def _set_worker_test(*test):
+    global _WORKER_TEST
+    _WORKER_TEST = test
+
+
+def _worker_block(size, seed_seq):
+    return _permutation_block(*_WORKER_TEST, size, seed_seq)
+
+
+def _permutation_block(data, col, group_col, test_statistic, size, seed_seq):
+    """Run `size` shuffles of group_col with their own random stream."""
+    rng = np.random.default_rng(seed_seq)
+    labels = data[group_col].to_numpy()
+    shuffled_stats = []
+    for _ in range(size):
+        with_shuffled = data[[col]].assign(shuffled=rng.permutation(labels))
+        shuffled_stats.append(test_statistic(with_shuffled, col, "shuffled"))
+    return shuffled_stats
+
+
+def permutation_test(data, col, group_col, test_statistic, N=1000, seed=None, n_workers=1):
     """
     Return the distribution of permuted statistics and the observed statistic
     resulting from a permutation test.
 
+    The N permutations are split into blocks of PERMUTATION_BLOCK, each drawn
+    from its own np.random.SeedSequence.spawn child stream and combined in
+    block order, so a given seed gives the same distribution for any
+    n_workers. With n_workers > 1, test_statistic must be picklable (defined
+    at module level, not a lambda).
+
     :param: data: DataFrame of data observations and the labels for two groups.
     :param: col: Column name for the column containing the data.
     :param: group_col: Column name for the column contain the labels for the two groups.
     :param: test_statistic: The test statistic to apply to the groups (a function).
     :param: N: The number of times N to run the permutation test.
+    :param: seed: Seed for the permutations; None draws one from np.random.
+    :param: n_workers: Number of worker processes to split the blocks across.
     """
 
     # get the observed test statistic
     obs = test_statistic(data, col, group_col)
 
-    # run the permutations
-    shuffled_stats = []
-    for _ in range(N):
-        shuffled = (
-            data[group_col]
-            .sample(frac=1, replace=False)
-            .reset_index(drop=True)
-        )
-        with_shuffled = data[[col]].assign(shuffled=shuffled)
-        shuffled_stat = test_statistic(with_shuffled, col, "shuffled")
-        shuffled_stats.append(shuffled_stat)
-
-    shuffled_stats = np.array(shuffled_stats)
+    # split the permutations into blocks with independent streams
+    if seed is None:
+        seed = int(np.random.randint(2**32, dtype=np.uint32))
+    sizes = [PERMUTATION_BLOCK] * (N // PERMUTATION_BLOCK)
+    if N % PERMUTATION_BLOCK:
+        sizes.append(N % PERMUTATION_BLOCK)
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    # run the permutations; workers receive the data once, at start-up
+    test = (data, col, group_col, test_statistic)
+    if n_workers > 1 and len(sizes) > 1:
+        chunksize = max(1, len(sizes) // (4 * n_workers))
+        with ProcessPoolExecutor(n_workers, initializer=_set_worker_test, initargs=test) as pool:
+            blocks = list(pool.map(_worker_block, sizes, streams, chunksize=chunksize))
+    else:
+        blocks = [_permutation_block(*test, size, stream) for size, stream in zip(sizes, streams)]
+
+    shuffled_stats = np.array([stat for block in blocks for stat in block])
 
     return shuffled_stats, obs
 